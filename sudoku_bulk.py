@@ -0,0 +1,606 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Supported input formats
+FORMATS = ("auto", "line", "sdk", "jsonl")
+
+# Characters accepted as an empty cell in the text formats
+EMPTY_CELLS = ".0"
+
+# Characters used to draw the grid in the SDK format
+DECORATIONS = "|-+"
+
+# Number of puzzles sent to a worker in one go
+BATCH_SIZE = 64
+
+# Bit mask with the bits 1 to 9 set, one per possible value
+ALL_VALUES = 0x3FE
+
+# Row, column and box index of each of the 81 cells
+ROW_OF = [i // 9 for i in range(81)]
+COL_OF = [i % 9 for i in range(81)]
+BOX_OF = [(i // 27) * 3 + (i % 9) // 3 for i in range(81)]
+
+
+def parse_cells(text):
+    """
+    Function to convert a puzzle string into a list of 81 cell values.
+
+    Parameters:
+    text : str, 81 characters, digits 1 to 9 for givens and '.' or '0' for empty cells
+
+    Returns:
+    list : list of 81 ints, 0 for empty cells
+    """
+    # Check the length of the puzzle
+    if len(text) != 81:
+        raise ValueError(f"expected 81 cells, got {len(text)}")
+    cells = []
+    for char in text:
+        # Empty cell
+        if char in EMPTY_CELLS:
+            cells.append(0)
+        # Given value
+        elif "1" <= char <= "9":
+            cells.append(int(char))
+        else:
+            raise ValueError(f"invalid cell character {char!r}")
+    return cells
+
+
+def strip_decorations(line):
+    """
+    Function to remove whitespace and grid decorations from an SDK row.
+
+    Parameters:
+    line : str, line of the input file
+
+    Returns:
+    str : the cells of the row
+    """
+    return "".join(char for char in line if not char.isspace() and char not in DECORATIONS)
+
+
+def grid_to_text(value):
+    """
+    Function to convert a grid, given as a string or a 9x9 list of ints, into a string.
+
+    Parameters:
+    value : str or list, the grid
+
+    Returns:
+    str : the grid as a string
+    """
+    # Flatten a 9x9 list into a string
+    if isinstance(value, list):
+        if len(value) != 9 or not all(isinstance(row, list) and len(row) == 9 for row in value):
+            raise ValueError("expected a 9x9 list")
+        value = "".join(str(val) for row in value for val in row)
+    if not isinstance(value, str):
+        raise ValueError("expected a string or a 9x9 list")
+    return value
+
+
+def parse_expected(value):
+    """
+    Function to convert the solution given with a puzzle into a string of 81 digits from 1 to 9.
+
+    Parameters:
+    value : str, list or None, the solution
+
+    Returns:
+    str : the solution, or None if no solution was given
+    """
+    if value is None:
+        return None
+    try:
+        expected = grid_to_text(value)
+    except ValueError:
+        expected = None
+    # Check the solution has a value from 1 to 9 in every cell
+    if expected is None or len(expected) != 81 or not all("1" <= char <= "9" for char in expected):
+        raise ValueError("invalid expected solution")
+    return expected
+
+
+def count_solutions(cells, limit=2):
+    """
+    Function to solve a puzzle and count its solutions, stopping once the limit is reached.
+
+    Parameters:
+    cells : list, 81 ints, 0 for empty cells
+    limit : int, number of solutions after which the search stops
+
+    Returns:
+    tuple : (first solution as a list of 81 ints or None, number of solutions found)
+    """
+    # Bit masks of the values already used in each row, column and box
+    rows = [0] * 9
+    cols = [0] * 9
+    boxes = [0] * 9
+    grid = list(cells)
+    empty = []
+
+    # Fill the masks with the givens, rejecting givens that conflict with each other
+    for i, val in enumerate(grid):
+        if val == 0:
+            empty.append(i)
+            continue
+        bit = 1 << val
+        r, c, b = ROW_OF[i], COL_OF[i], BOX_OF[i]
+        if (rows[r] | cols[c] | boxes[b]) & bit:
+            return None, 0
+        rows[r] |= bit
+        cols[c] |= bit
+        boxes[b] |= bit
+
+    solution = None
+    count = 0
+
+    def search():
+        """
+        Function to fill the empty cells by backtracking, always trying the cell with fewest candidates first.
+
+        Returns:
+        bool : True if the search should stop
+        """
+        nonlocal solution, count
+
+        # Find the empty cell with the fewest candidates
+        best = -1
+        best_mask = 0
+        best_count = 10
+        for i in empty:
+            if grid[i] != 0:
+                continue
+            mask = ALL_VALUES & ~(rows[ROW_OF[i]] | cols[COL_OF[i]] | boxes[BOX_OF[i]])
+            n = bin(mask).count("1")
+            # No candidate left, this branch is a dead end
+            if n == 0:
+                return False
+            if n < best_count:
+                best, best_mask, best_count = i, mask, n
+                # A single candidate can't be beaten
+                if n == 1:
+                    break
+
+        # Check if every cell is filled
+        if best == -1:
+            count += 1
+            if solution is None:
+                solution = list(grid)
+            return count >= limit
+
+        r, c, b = ROW_OF[best], COL_OF[best], BOX_OF[best]
+        # Loop over the candidates of the chosen cell
+        while best_mask:
+            bit = best_mask & -best_mask
+            best_mask ^= bit
+            # Add the value
+            grid[best] = bit.bit_length() - 1
+            rows[r] |= bit
+            cols[c] |= bit
+            boxes[b] |= bit
+            if search():
+                return True
+            # Back track, remove the value
+            rows[r] ^= bit
+            cols[c] ^= bit
+            boxes[b] ^= bit
+        grid[best] = 0
+        return False
+
+    search()
+    return solution, count
+
+
+def verify_solution(cells, expected):
+    """
+    Function to check that an expected solution solves a puzzle.
+
+    The expected grid is checked on its own rather than compared with the solver's
+    solution, so a correct solution of a puzzle with several solutions is accepted.
+
+    Parameters:
+    cells : list, 81 ints of the puzzle, 0 for empty cells
+    expected : str, 81 digits from 1 to 9
+
+    Returns:
+    bool : True if the expected solution keeps every given and has no conflicts
+    """
+    expected_cells = parse_cells(expected)
+    # Check every given is kept
+    if any(val != 0 and val != expected_cells[i] for i, val in enumerate(cells)):
+        return False
+    # A full grid has a solution only if it has no conflicts
+    return count_solutions(expected_cells, 1)[1] == 1
+
+
+def solve_record(record):
+    """
+    Function to solve one puzzle record and build its result.
+
+    Parameters:
+    record : dict, with 'index', 'id', 'puzzle' and optionally 'expected', 'expected_error' and 'error' keys
+
+    Returns:
+    dict : result with the solution, uniqueness flag, timing, verification and any error
+    """
+    result = {
+        "index": record["index"],
+        "id": record["id"],
+        "puzzle": record.get("puzzle"),
+        "solution": None,
+        "solved": False,
+        "unique": False,
+        "time_ms": 0.0,
+        "matches": None,
+        "expected_error": record.get("expected_error"),
+        "error": record.get("error"),
+    }
+    # Errors found while reading the record are passed through
+    if result["error"] is not None:
+        return result
+
+    start = time.perf_counter()
+    try:
+        cells = parse_cells(record["puzzle"])
+    except ValueError as e:
+        result["error"] = str(e)
+        return result
+
+    solution, count = count_solutions(cells)
+    result["time_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+    # Verify the solution shipped with the puzzle, if any
+    expected = record.get("expected")
+    if expected is not None:
+        result["matches"] = verify_solution(cells, expected)
+
+    if solution is None:
+        result["error"] = "no solution"
+        return result
+
+    result["solution"] = "".join(map(str, solution))
+    result["solved"] = True
+    result["unique"] = count == 1
+    return result
+
+
+def _solve_batch(batch):
+    """
+    Function to solve a batch of records in a worker process.
+
+    Parameters:
+    batch : list, records to solve
+
+    Returns:
+    list : results in the same order as the records
+    """
+    return [solve_record(record) for record in batch]
+
+
+def read_line_puzzles(lines):
+    """
+    Function to read puzzles with one 81 character puzzle per line.
+
+    A second token on the line is read as the expected solution, unless it starts a '#'
+    comment. An invalid expected solution is reported in 'expected_error' and the puzzle
+    is still solved. Blank lines and lines starting with '#' are skipped.
+
+    Parameters:
+    lines : iterable, lines of the input file
+
+    Returns:
+    generator : puzzle records
+    """
+    index = 0
+    for line_number, line in enumerate(lines, 1):
+        tokens = line.split()
+        # Skip blank and comment lines
+        if not tokens or tokens[0].startswith("#"):
+            continue
+        record = {"index": index, "id": line_number, "puzzle": tokens[0]}
+        index += 1
+        # Read the expected solution, if any
+        if len(tokens) > 1 and not tokens[1].startswith("#"):
+            try:
+                record["expected"] = parse_expected(tokens[1])
+            except ValueError as e:
+                record["expected_error"] = str(e)
+        yield record
+
+
+def read_sdk_puzzles(lines):
+    """
+    Function to read puzzles in the SDK format, nine rows of nine cells per puzzle.
+
+    Several puzzles can follow each other in the same file. Lines starting with '#' are
+    comments, and whitespace and '|', '-', '+' grid decorations are ignored. A puzzle with
+    a row that isn't nine cells long is reported as an error.
+
+    Parameters:
+    lines : iterable, lines of the input file
+
+    Returns:
+    generator : puzzle records
+    """
+    index = 0
+    rows = []
+    first_line = None
+    error = None
+    for line_number, line in enumerate(lines, 1):
+        # Skip comment lines
+        if line.lstrip().startswith("#"):
+            continue
+        # Blank line between puzzles
+        if not line.strip():
+            # A blank line in the middle of a puzzle means the puzzle is incomplete
+            if rows:
+                yield {"index": index, "id": first_line, "puzzle": None,
+                       "error": error or f"expected 9 rows, got {len(rows)}"}
+                index += 1
+                rows = []
+                error = None
+            continue
+        row = strip_decorations(line)
+        # Skip decoration only lines
+        if not row:
+            continue
+        if not rows:
+            first_line = line_number
+        # Keep the first bad row of the puzzle, the rest of it is still read to stay aligned
+        if len(row) != 9 and error is None:
+            error = f"line {line_number}: expected 9 cells, got {len(row)}"
+        rows.append(row)
+        # Check if the puzzle is complete
+        if len(rows) == 9:
+            if error is None:
+                yield {"index": index, "id": first_line, "puzzle": "".join(rows)}
+            else:
+                yield {"index": index, "id": first_line, "puzzle": None, "error": error}
+            index += 1
+            rows = []
+            error = None
+
+    # Puzzle cut short by the end of the file
+    if rows:
+        yield {"index": index, "id": first_line, "puzzle": None,
+               "error": error or f"expected 9 rows, got {len(rows)}"}
+
+
+def read_jsonl_puzzles(lines):
+    """
+    Function to read puzzles with one JSON object per line.
+
+    The puzzle is read from the 'puzzle' key and the optional expected solution from the
+    'solution' key, each either as an 81 character string or as a 9x9 list of ints. The
+    optional 'id' key is kept in the result. Blank lines and lines starting with '#' are
+    skipped.
+
+    Parameters:
+    lines : iterable, lines of the input file
+
+    Returns:
+    generator : puzzle records
+    """
+    index = 0
+    for line_number, line in enumerate(lines, 1):
+        # Skip blank and comment lines
+        text = line.strip()
+        if not text or text.startswith("#"):
+            continue
+        record = {"index": index, "id": line_number, "puzzle": None}
+        index += 1
+        try:
+            data = json.loads(line)
+            puzzle = grid_to_text(data["puzzle"])
+        except (ValueError, TypeError, KeyError) as e:
+            record["error"] = f"invalid record: {e}"
+            yield record
+            continue
+
+        record["id"] = data.get("id", line_number)
+        record["puzzle"] = puzzle
+        # Read the expected solution, if any
+        try:
+            record["expected"] = parse_expected(data.get("solution"))
+        except ValueError as e:
+            record["expected_error"] = str(e)
+        yield record
+
+
+READERS = {
+    "line": read_line_puzzles,
+    "sdk": read_sdk_puzzles,
+    "jsonl": read_jsonl_puzzles,
+}
+
+
+def detect_format(lines, path=None):
+    """
+    Function to guess the format of a puzzle file from its extension or its first lines.
+
+    Parameters:
+    lines : iterator, lines of the input file
+    path : str, file name, or None
+
+    Returns:
+    tuple : (format name, iterator over all the lines including the ones looked at)
+    """
+    # Check the file extension first
+    if path is not None:
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".sdk":
+            return "sdk", lines
+        if extension in (".jsonl", ".ndjson"):
+            return "jsonl", lines
+
+    # Look at the first line with content, skipping SDK decoration lines
+    peeked = []
+    fmt = "line"
+    for line in lines:
+        peeked.append(line)
+        text = line.strip()
+        if not text or text.startswith("#") or not strip_decorations(text):
+            continue
+        # A JSON array can't be streamed line by line
+        if text.startswith("["):
+            raise ValueError("JSON array input is not supported, convert it to JSONL with one object per line")
+        if text.startswith("{"):
+            fmt = "jsonl"
+        # Only a row of exactly nine cells looks like SDK, anything else is left to the line reader
+        elif len(strip_decorations(text)) == 9:
+            fmt = "sdk"
+        break
+    # Put the lines looked at back in front of the rest
+    return fmt, itertools.chain(peeked, lines)
+
+
+def solve_stream(records, workers=None, batch_size=BATCH_SIZE):
+    """
+    Function to solve a stream of puzzle records in worker processes.
+
+    Only a few batches per worker are in flight at any time, so the memory used doesn't
+    grow with the size of the input. Results are returned in input order.
+
+    Parameters:
+    records : iterable, puzzle records
+    workers : int, number of worker processes, None for one per CPU, 1 to solve in this process
+    batch_size : int, number of records sent to a worker at a time
+
+    Returns:
+    generator : results
+    """
+    records = iter(records)
+    batches = iter(lambda: list(itertools.islice(records, batch_size)), [])
+
+    # Solve in this process
+    if workers == 1:
+        for batch in batches:
+            yield from _solve_batch(batch)
+        return
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        max_pending = 4 * (workers or os.cpu_count() or 1)
+        pending = deque()
+        for batch in batches:
+            pending.append(executor.submit(_solve_batch, batch))
+            # Wait for the oldest batch once enough are in flight
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        # Collect the remaining batches
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        # Drop the batches not started yet if the results stop being read early
+        executor.shutdown(cancel_futures=True)
+
+
+def bulk_solve(input_file, output_file, fmt="auto", workers=None, path=None):
+    """
+    Function to solve every puzzle of an input file and write one JSON result per line.
+
+    Parameters:
+    input_file : file, text file with the puzzles
+    output_file : file, text file the results are written to
+    fmt : str, one of FORMATS
+    workers : int, number of worker processes
+    path : str, input file name used to detect the format, or None
+
+    Returns:
+    dict : number of puzzles read, solved, unique and failed
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt!r}")
+
+    lines = iter(input_file)
+    if fmt == "auto":
+        fmt, lines = detect_format(lines, path)
+    records = READERS[fmt](lines)
+
+    summary = {"format": fmt, "total": 0, "solved": 0, "unique": 0, "failed": 0}
+    results = solve_stream(records, workers)
+    try:
+        for result in results:
+            # Write each result as soon as it's available
+            output_file.write(json.dumps(result) + "\n")
+            summary["total"] += 1
+            summary["solved"] += result["solved"]
+            summary["unique"] += result["unique"]
+            summary["failed"] += result["error"] is not None
+    finally:
+        # Shut down the workers even if writing fails
+        results.close()
+    return summary
+
+
+def positive_int(value):
+    """
+    Function to parse a command line argument as an int greater than zero.
+
+    Parameters:
+    value : str, argument value
+
+    Returns:
+    int : the parsed value
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value!r}")
+    return number
+
+
+def main(argv=None):
+    """
+    Function to run the bulk solver from the command line.
+
+    Parameters:
+    argv : list, command line arguments, None to use sys.argv
+    """
+    parser = argparse.ArgumentParser(description="Solve and verify Sudoku puzzles in bulk.")
+    parser.add_argument("input", help="puzzle file, '-' for standard input")
+    parser.add_argument("output", nargs="?", default="-", help="JSONL results file, '-' for standard output")
+    parser.add_argument("--format", choices=FORMATS, default="auto", help="input format (default: auto)")
+    parser.add_argument("--workers", type=positive_int, default=None, help="number of worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    input_file = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8-sig")
+    output_file = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        summary = bulk_solve(input_file, output_file, args.format, args.workers,
+                             None if args.input == "-" else args.input)
+    except ValueError as e:
+        parser.error(str(e))
+    except BrokenPipeError:
+        # The reader of the output went away, e.g. piped into head. Point stdout at devnull
+        # so Python doesn't fail again flushing it on exit.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+    # Show the summary on stderr so it doesn't mix with the results
+    elapsed = time.perf_counter() - start
+    print(f"{summary['total']} puzzles ({summary['format']}): {summary['solved']} solved, "
+          f"{summary['unique']} unique, {summary['failed']} failed in {elapsed:.2f} seconds", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import io
+import json
+
+import pytest
+
+import sudoku_bulk
+
+
+PUZZLE = "53..7....6..195....98....6.8...6...34..8.3..17...2...6.6....28....419..5....8..79"
+SOLUTION = "534678912672195348198342567859761423426853791713924856961537284287419635345286179"
+
+# Second solution of the empty grid, different from the one the solver finds first
+OTHER_SOLUTION = "123456789456789123789123456214365897365897214897214365531642978642978531978531642"
+
+DECORATED_SDK = """\
+# Decorated grid
++---+---+---+
+|53.|.7.|...|
+|6..|195|...|
+|.98|...|.6.|
++---+---+---+
+|8..|.6.|..3|
+|4..|8.3|..1|
+|7..|.2.|..6|
++---+---+---+
+|.6.|...|28.|
+|...|419|..5|
+|...|.8.|.79|
++---+---+---+
+"""
+
+
+def to_grid(text):
+    """
+    Function to convert an 81 character string into a 9x9 list of ints.
+    """
+    return [[int(char) if char != "." else 0 for char in text[i:i + 9]] for i in range(0, 81, 9)]
+
+
+def test_count_solutions_unique():
+    solution, count = sudoku_bulk.count_solutions(sudoku_bulk.parse_cells(PUZZLE))
+    assert "".join(map(str, solution)) == SOLUTION
+    assert count == 1
+
+
+def test_count_solutions_several():
+    solution, count = sudoku_bulk.count_solutions([0] * 81)
+    assert solution is not None
+    assert count == 2
+
+
+def test_count_solutions_contradiction():
+    cells = sudoku_bulk.parse_cells("55" + PUZZLE[2:])
+    assert sudoku_bulk.count_solutions(cells) == (None, 0)
+
+
+def test_read_line_puzzles():
+    lines = [
+        "# comment\n",
+        "\n",
+        f"{PUZZLE} {SOLUTION}\n",
+        f"{PUZZLE} # note\n",
+        f"{PUZZLE} {SOLUTION[:80]}\n",
+    ]
+    records = list(sudoku_bulk.read_line_puzzles(lines))
+    assert [record["id"] for record in records] == [3, 4, 5]
+    assert records[0]["expected"] == SOLUTION
+    assert "expected" not in records[1]
+    assert records[2]["expected_error"] == "invalid expected solution"
+    assert "error" not in records[2]
+
+
+def test_read_sdk_puzzles_decorated():
+    records = list(sudoku_bulk.read_sdk_puzzles(DECORATED_SDK.splitlines(True)))
+    assert len(records) == 1
+    assert records[0]["puzzle"] == PUZZLE
+    assert records[0]["id"] == 3
+
+
+def test_read_sdk_puzzles_bad_rows():
+    rows = [PUZZLE[i:i + 9] for i in range(0, 81, 9)]
+    # Move a cell from the second row to the first
+    bad = [rows[0] + rows[1][0], rows[1][1:]] + rows[2:]
+    lines = [row + "\n" for row in bad] + ["\n"] + [row + "\n" for row in rows] + ["\n", rows[0] + "\n"]
+    records = list(sudoku_bulk.read_sdk_puzzles(lines))
+    assert records[0]["error"] == "line 1: expected 9 cells, got 10"
+    assert records[1]["puzzle"] == PUZZLE
+    assert records[2]["error"] == "expected 9 rows, got 1"
+
+
+def test_read_jsonl_puzzles():
+    lines = [
+        "# header\n",
+        json.dumps({"id": "grid", "puzzle": to_grid(PUZZLE), "solution": to_grid(SOLUTION)}) + "\n",
+        json.dumps({"puzzle": PUZZLE, "solution": "x" * 81}) + "\n",
+        "not json\n",
+    ]
+    records = list(sudoku_bulk.read_jsonl_puzzles(lines))
+    assert len(records) == 3
+    assert records[0]["id"] == "grid"
+    assert records[0]["puzzle"] == PUZZLE.replace(".", "0")
+    assert records[0]["expected"] == SOLUTION
+    assert records[1]["expected_error"] == "invalid expected solution"
+    assert records[2]["error"].startswith("invalid record")
+
+
+@pytest.mark.parametrize("lines, path, fmt", [
+    ([PUZZLE + "\n"], None, "line"),
+    (["# comment\n", "bad line\n", PUZZLE + "\n"], None, "line"),
+    (DECORATED_SDK.splitlines(True), "puzzles.txt", "sdk"),
+    (["# header\n", json.dumps({"puzzle": PUZZLE}) + "\n"], None, "jsonl"),
+    ([PUZZLE + "\n"], "puzzles.sdk", "sdk"),
+    ([PUZZLE + "\n"], "puzzles.ndjson", "jsonl"),
+])
+def test_detect_format(lines, path, fmt):
+    detected, rest = sudoku_bulk.detect_format(iter(lines), path)
+    assert detected == fmt
+    assert list(rest) == lines
+
+
+def test_detect_format_json_array():
+    with pytest.raises(ValueError):
+        sudoku_bulk.detect_format(iter(["[\n", "{}\n", "]\n"]), "puzzles.json")
+
+
+def run_bulk_solve(text, **kwargs):
+    """
+    Function to run bulk_solve on a string and return the summary and the parsed results.
+    """
+    output = io.StringIO()
+    summary = sudoku_bulk.bulk_solve(io.StringIO(text), output, **kwargs)
+    return summary, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_bulk_solve():
+    text = "\n".join([
+        f"{PUZZLE} {SOLUTION}",
+        f"{'0' * 81} {OTHER_SOLUTION}",
+        f"{PUZZLE} {'1' * 81}",
+        f"{PUZZLE} bad",
+        "55" + PUZZLE[2:],
+    ]) + "\n"
+    summary, results = run_bulk_solve(text, workers=1)
+    assert summary == {"format": "line", "total": 5, "solved": 4, "unique": 3, "failed": 1}
+    assert all(results[0].keys() == result.keys() for result in results)
+
+    assert results[0]["solution"] == SOLUTION
+    assert results[0]["matches"] is True
+    assert results[1]["unique"] is False
+    assert results[1]["matches"] is True
+    assert results[2]["matches"] is False
+    assert results[3]["solved"] is True
+    assert results[3]["matches"] is None
+    assert results[3]["expected_error"] == "invalid expected solution"
+    assert results[4]["error"] == "no solution"
+
+
+def test_bulk_solve_process_pool():
+    summary, results = run_bulk_solve((PUZZLE + "\n") * 200, workers=2)
+    assert summary["solved"] == 200
+    assert [result["index"] for result in results] == list(range(200))
+    assert all(result["solution"] == SOLUTION for result in results)